@@ -1,7 +1,6 @@
 import numpy as np
-import csv
-from sklearn.cluster import MeanShift
-from fuzzywuzzy import fuzz
+import pandas as pd
+from rapidfuzz import fuzz, process
 
 class POIOptimizer:
     @staticmethod
@@ -43,13 +42,57 @@ class POIOptimizer:
             median = new_median
         return median
 
+    @staticmethod
+    def estimate_bandwidth(coords, quantile=0.2, n_pairs=1000, random_state=0):
+        """
+        Estimate the Mean Shift bandwidth as a quantile of the distances between random pairs of points.
+        """
+        rng = np.random.default_rng(random_state)
+        first = rng.integers(len(coords), size=n_pairs)
+        second = rng.integers(len(coords), size=n_pairs)
+        distances = np.linalg.norm(coords[first] - coords[second], axis=1)
+        distances = distances[distances > 0]
+        return np.quantile(distances, quantile) if len(distances) else 0.0
+
+    @staticmethod
+    def fast_mean_shift(coords, bandwidth=None, n_seeds=64, max_iter=20, tolerance=1e-7, random_state=0):
+        """
+        Find the densest mode of the points with a Gaussian Mean Shift.
+        Only a random subset of seeds is shifted, and iteration stops once they converge.
+        """
+        coords = np.asarray(coords, dtype=float)
+        if bandwidth is None:
+            bandwidth = POIOptimizer.estimate_bandwidth(coords, random_state=random_state)
+        if bandwidth <= 0:
+            return coords.mean(axis=0)
+
+        rng = np.random.default_rng(random_state)
+        seeds = coords[rng.choice(len(coords), size=min(n_seeds, len(coords)), replace=False)]
+        for _ in range(max_iter):
+            weights = np.exp(-((coords[None] - seeds[:, None]) ** 2).sum(axis=-1) / (2 * bandwidth ** 2))
+            new_seeds = (weights @ coords) / weights.sum(axis=1, keepdims=True)
+            shift = np.max(np.abs(new_seeds - seeds))
+            seeds = new_seeds
+            if shift < tolerance:
+                break
+
+        # Merge seeds that converged to the same mode
+        modes = []
+        for seed in seeds:
+            if all(np.linalg.norm(seed - mode) >= bandwidth for mode in modes):
+                modes.append(seed)
+        modes = np.array(modes)
+
+        # Snap every point to its nearest mode and keep the most popular one
+        labels = np.argmin(((coords[:, None] - modes[None]) ** 2).sum(axis=-1), axis=1)
+        return modes[np.bincount(labels, minlength=len(modes)).argmax()]
+
     @staticmethod
     def cluster_optimized_position(latitudes, longitudes):
         coords = np.array([latitudes, longitudes]).T
-        clustering = MeanShift().fit(coords)  # Sử dụng Mean Shift thay vì DBSCAN
-        cluster_centers = clustering.cluster_centers_
-        largest_cluster_center = cluster_centers[0]  # Lấy trung tâm của cụm lớn nhất
+        largest_cluster_center = POIOptimizer.fast_mean_shift(coords)  # Lấy trung tâm của cụm lớn nhất
         return largest_cluster_center
+
     @staticmethod
     def calculate_average_distance(distances):
         """
@@ -62,6 +105,7 @@ class POIOptimizer:
         """
         Calculate new latitude and longitude based on starting point, bearing, and distance.
         Uses haversine formula to calculate the new position.
+        Accepts scalars or equally sized arrays, so many points can be moved in one call.
         """
         R = 6371000  # Radius of Earth in meters
         bearing = np.radians(bearing)
@@ -90,25 +134,31 @@ class POIOptimizationProcessor:
     def group_similar_pois(self, poi_groups):
         """
         Merge POI groups with similar names using fuzzy matching.
+        Names are compared all at once and merged transitively with union-find.
         """
-        merged_poi_groups = {}
-        processed_names = set()
+        names = list(poi_groups.keys())
+        similarity = process.cdist(
+            [name.lower() for name in names], [name.lower() for name in names],
+            scorer=fuzz.ratio, score_cutoff=85, workers=-1
+        )
 
-        for poi_name in poi_groups.keys():
-            if poi_name in processed_names:
-                continue
+        parent = list(range(len(names)))
 
-            merged_poi_groups[poi_name] = poi_groups[poi_name]
-            processed_names.add(poi_name)
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
 
-            for other_name in poi_groups.keys():
-                if other_name in processed_names:
-                    continue
+        # Link every pair above the threshold, keeping the earliest name as the root
+        for i, j in zip(*np.nonzero(np.triu(similarity > 85, k=1))):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
 
-                similarity = fuzz.ratio(poi_name.lower(), other_name.lower())
-                if similarity > 85:  # Threshold for merging similar names
-                    merged_poi_groups[poi_name].extend(poi_groups[other_name])
-                    processed_names.add(other_name)
+        merged_poi_groups = {}
+        for i, poi_name in enumerate(names):
+            merged_poi_groups.setdefault(names[find(i)], []).extend(poi_groups[poi_name])
 
         return merged_poi_groups
 
@@ -116,54 +166,51 @@ class POIOptimizationProcessor:
         """
         Optimize POI positions based on average distance and minimum bearing.
         """
-        poi_groups = {}
-
-        # Step 1: Read the input CSV and group POIs by name
-        with open(self.input_csv, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                poi_name = row['poi_name']
-                if not poi_name:
-                    continue
-
-                source_lat = float(row['source_lat'])
-                source_lon = float(row['source_lon'])
-                poi_lat = float(row['poi_lat'])
-                poi_lon = float(row['poi_lon'])
-                distance = float(row['distance'])
-                bearing = float(row['bearing'])
-                side = row['side'].lower()
-              # In giá trị 'side'
-                if side != 'right':
-                    continue
-                
-                if poi_name not in poi_groups:
-                    poi_groups[poi_name] = []
-
-                poi_groups[poi_name].append((poi_lat, poi_lon, bearing, distance, source_lat, source_lon))
+        # Step 1: Read the input CSV and keep named POIs on the right side
+        df = pd.read_csv(
+            self.input_csv,
+            usecols=['poi_name', 'source_lat', 'source_lon', 'poi_lat', 'poi_lon', 'distance', 'bearing', 'side'],
+            dtype={
+                'poi_name': str, 'side': str,
+                'source_lat': 'f8', 'source_lon': 'f8',
+                'poi_lat': 'f8', 'poi_lon': 'f8',
+                'distance': 'f8', 'bearing': 'f8'
+            },
+            encoding='utf-8-sig',
+            float_precision='round_trip',
+            # Only empty cells are missing: POI names such as "NA" or "None" are real names
+            keep_default_na=False,
+            na_values={
+                column: ['']
+                for column in ['poi_name', 'source_lat', 'source_lon', 'poi_lat', 'poi_lon', 'distance', 'bearing']
+            }
+        )
+        df = df[df['side'].str.lower().eq('right') & df['poi_name'].notna()]
 
         # Step 2: Optimize positions for each group
-        optimized_results = []
-        for poi_name, group in poi_groups.items():
-            distances = [g[3] for g in group]  # Extract distances
-            average_distance = POIOptimizer.calculate_average_distance(distances)
-
-            # Find the POI with the minimum bearing
-            min_bearing_point = POIOptimizer.find_min_bearing(group)
-
-            # Use the average distance and minimum bearing point to determine new position
-            optimal_lat, optimal_lon = POIOptimizer.calculate_new_position(
-                min_bearing_point[0], min_bearing_point[1], min_bearing_point[2], average_distance
-            )
-            # Add optimized result for each original source point
-            for _, _, _, _, source_lat, source_lon in group:
-                optimized_results.append([source_lat, source_lon, poi_name, optimal_lat, optimal_lon])
+        groups = df.groupby('poi_name', sort=False)
+        average_distances = groups['distance'].mean()
+
+        # Find the POI with the minimum bearing in each group
+        min_bearing_points = df.loc[groups['bearing'].idxmin()].set_index('poi_name')
+
+        # Use the average distance and minimum bearing point to determine new positions for all groups at once
+        optimal_lat, optimal_lon = POIOptimizer.calculate_new_position(
+            min_bearing_points['poi_lat'].to_numpy(),
+            min_bearing_points['poi_lon'].to_numpy(),
+            min_bearing_points['bearing'].to_numpy(),
+            average_distances.reindex(min_bearing_points.index).to_numpy()
+        )
+        optimal_positions = pd.DataFrame(
+            {'optimal_lat': optimal_lat, 'optimal_lon': optimal_lon},
+            index=min_bearing_points.index
+        )
+
+        # Add optimized result for each original source point, group by group
+        order = np.argsort(groups.ngroup().to_numpy(), kind='stable')
+        optimized_results = df.iloc[order][['source_lat', 'source_lon', 'poi_name']].join(optimal_positions, on='poi_name')
 
         # Step 3: Write optimized results to a new CSV
-        with open(self.output_csv_optimized, mode='w', newline='', encoding='utf-8-sig') as file:
-            writer = csv.writer(file)
-            header = ["source_lat", "source_lon", "poi_name", "optimal_lat", "optimal_lon"]
-            writer.writerow(header)
-            writer.writerows(optimized_results)
+        optimized_results.to_csv(self.output_csv_optimized, index=False, encoding='utf-8-sig', lineterminator='\r\n')
 
         print(f"Optimized POI positions have been saved to: {self.output_csv_optimized}")
\ No newline at end of file
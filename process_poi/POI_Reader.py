@@ -1,16 +1,51 @@
 import csv
+import pandas as pd
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class RateLimiter:
+    def __init__(self, max_calls, period=1.0):
+        """
+        Allow at most max_calls calls per period (in seconds), shared across threads.
+        """
+        self.interval = period / max_calls
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Block until the next call is allowed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
 
 class POIReader:
-    def __init__(self, api_key, base_url, radius, place_type):
+    def __init__(self, api_key, base_url, radius, place_type, max_workers=32, requests_per_second=1):
         """
         Initialize POIReader with API parameters and search configuration.
+        Up to max_workers searches run concurrently, capped at requests_per_second.
         """
         self.api_key = api_key
         self.base_url = base_url
         self.radius = radius
         self.place_type = place_type
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        # One pooled keep-alive session shared by all workers, retrying transient errors
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def read_coordinates_from_csv(self, file_path):
         """
@@ -31,6 +66,8 @@ class POIReader:
     def nearby_search(self, lat, lon):
         """
         Perform Nearby Search for a given coordinate, returning the result as JSON.
+        Only the first attempt waits on the rate limiter: retries of 429/5xx responses are
+        resent by the session's urllib3 Retry (with backoff and Retry-After) and are not counted.
         """
         params = {
             "key": self.api_key,
@@ -38,8 +75,9 @@ class POIReader:
             "radius": self.radius,
             "types": self.place_type,
         }
+        self.rate_limiter.wait()
         try:
-            response = requests.get(self.base_url, params=params)
+            response = self.session.get(self.base_url, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -53,34 +91,39 @@ class POIReader:
         header = ["source_lat", "source_lon", "poi_name", "poi_lat", "poi_lon", "poi_type", "distance"]
 
         try:
-            with open(output_path, mode="w", newline="", encoding="utf-8-sig") as file:
-                writer = csv.writer(file)
-                writer.writerow(header)
-
-                for result in results:
-                    source_lat = result["lat"]
-                    source_lon = result["lon"]
-                    nearby = result.get("nearby", {})
-                    nearby_results = nearby.get("result", [])
-                    code = nearby.get("code", "error")
-
-                    if not nearby_results and code == "ok":
-                        writer.writerow([source_lat, source_lon, None, None, None, None, None])
-                        continue
-
-                    for poi in nearby_results:
-                        name = poi.get("name", None)
-                        location = poi.get("location", {})
-                        poi_lat = location.get("lat", None)
-                        poi_lon = location.get("lon", None)  
-                        poi_type = poi.get("types", [None])[0]  
-                        row = [source_lat, source_lon, name, poi_lat, poi_lon, poi_type, None]  # Distance not yet calculated
-                        writer.writerow(row)
+            rows = []
+            for result in results:
+                source_lat = result["coordinate"]["lat"]
+                source_lon = result["coordinate"]["lon"]
+                nearby = result.get("nearby", {})
+                nearby_results = nearby.get("result", [])
+                code = nearby.get("code", "error")
+
+                if not nearby_results and code == "ok":
+                    rows.append([source_lat, source_lon, None, None, None, None, None])
+                    continue
+
+                for poi in nearby_results:
+                    name = poi.get("name", None)
+                    location = poi.get("location", {})
+                    poi_lat = location.get("lat", None)
+                    poi_lon = location.get("lng", None)  
+                    poi_type = poi.get("types", [None])[0]  
+                    rows.append([source_lat, source_lon, name, poi_lat, poi_lon, poi_type, None])  # Distance not yet calculated
+
+            pd.DataFrame(rows, columns=header).to_csv(output_path, index=False, encoding="utf-8-sig", lineterminator="\r\n")
             print(f"Results have been saved to:  {output_path}")
         except Exception as e:
             print(f"Error writing to CSV file:{e}")
 
-    def process(self, input_csv, output_csv, batch_size=200):
+    def _search(self, coord):
+        """
+        Perform Nearby Search for a single coordinate from the input CSV.
+        """
+        print(f"Performing nearby search for coordinate: {coord['lat']}, {coord['lon']}")
+        return self.nearby_search(coord["lat"], coord["lon"])
+
+    def process(self, input_csv, output_csv):
         """
         Read coordinates from a CSV file, perform Nearby Search, and save results to a CSV file.
         """
@@ -89,24 +132,16 @@ class POIReader:
             print("No valid coordinates to process.")
             return []
 
-        results = []
-
-        for i in range(0, len(coordinates), batch_size):
-            batch = coordinates[i:i + batch_size]
-            for coord in batch:
-                print(f"Performing nearby search for coordinate: {coord['lat']}, {coord['lon']}")
-                result = self.nearby_search(coord["lat"], coord["lon"])
-                if result:
-                    results.append({"coordinate": coord, "nearby": result})
-                time.sleep(1)  # Avoid sending too many requests in quick succession
-
-            print(f"Nearby Search results for batch {i // batch_size + 1}:")
-            for res in results[-len(batch):]:  #  Print results for the current batch
-                print(res)
+        # Requests overlap on the thread pool; the rate limiter keeps us within the API limit
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            responses = list(executor.map(self._search, coordinates))
 
-            user_input = input("Do you want to continue with the next batch? (y/n): ").strip().lower()
-            if user_input != "y":
-                break
+        results = [
+            {"coordinate": coord, "nearby": result}
+            for coord, result in zip(coordinates, responses)
+            if result
+        ]
+        print(f"Nearby Search returned results for {len(results)}/{len(coordinates)} coordinates.")
 
         self.write_poi_to_csv(output_csv, results)
         return results
@@ -1,16 +1,112 @@
-import csv
 import folium
+from folium.plugins import FastMarkerCluster
 import math
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, the NumPy kernel is used without it
+    njit = None
+
+EARTH_RADIUS = 6371 * 1000
+TWO_EARTH_RADIUS = 2 * EARTH_RADIUS
+DEG2RAD = math.pi / 180
+RAD2DEG = 180 / math.pi
+
+# Side codes used while processing: 0 = Left, 1 = Right
+SIDE_LABELS = np.array(["Left", "Right"])
+
+def _flatten_results(results):
+    """
+    Flatten Nearby Search results into per-POI columns.
+    """
+    src_lat, src_lon, poi_lat, poi_lon, result_index = [], [], [], [], []
+    names, types = [], []
+    for i, result in enumerate(results):
+        source_lat = result['coordinate']["lat"]
+        source_lon = result['coordinate']["lon"]
+        nearby_results = result["nearby"].get("result", [])
+
+        for poi in nearby_results:
+            location = poi.get("location", {})
+            src_lat.append(source_lat)
+            src_lon.append(source_lon)
+            poi_lat.append(location.get("lat"))
+            poi_lon.append(location.get("lng"))
+            result_index.append(i)
+            names.append(poi.get("name"))
+            types.append(",".join(poi.get("types", [])))
+
+    return (
+        np.array(src_lat, dtype=float), np.array(src_lon, dtype=float),
+        np.array(poi_lat, dtype=float), np.array(poi_lon, dtype=float),
+        np.array(result_index, dtype=int),
+        np.array(names, dtype=object), np.array(types, dtype=object)
+    )
+
+def _distance_and_bearing_numpy(src_lat, src_lon, poi_lat, poi_lon):
+    """
+    Calculate the haversine distance and bearing for arrays of coordinate pairs given in radians.
+    """
+    dlat = poi_lat - src_lat
+    dlon = poi_lon - src_lon
+    cos_src_lat = np.cos(src_lat)
+    cos_poi_lat = np.cos(poi_lat)
+
+    a = np.sin(dlat * 0.5) ** 2 + cos_src_lat * cos_poi_lat * np.sin(dlon * 0.5) ** 2
+    distances = TWO_EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    y = np.sin(dlon) * cos_poi_lat
+    x = cos_src_lat * np.sin(poi_lat) - np.sin(src_lat) * cos_poi_lat * np.cos(dlon)
+    bearings = (np.arctan2(y, x) * RAD2DEG + 360) % 360
+
+    return distances, bearings
+
+if njit is not None:
+    # Fast math without the no-NaN/no-Inf flags: missing coordinates arrive as NaN
+    @njit(parallel=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"}, cache=True)
+    def _distance_and_bearing(src_lat, src_lon, poi_lat, poi_lon):
+        """
+        Same as _distance_and_bearing_numpy, compiled into a parallel loop over the rows.
+        """
+        n = src_lat.shape[0]
+        distances = np.empty(n)
+        bearings = np.empty(n)
+        for i in prange(n):
+            dlat = poi_lat[i] - src_lat[i]
+            dlon = poi_lon[i] - src_lon[i]
+            cos_src_lat = math.cos(src_lat[i])
+            cos_poi_lat = math.cos(poi_lat[i])
+
+            a = math.sin(dlat * 0.5) ** 2 + cos_src_lat * cos_poi_lat * math.sin(dlon * 0.5) ** 2
+            distances[i] = TWO_EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+            y = math.sin(dlon) * cos_poi_lat
+            x = cos_src_lat * math.sin(poi_lat[i]) - math.sin(src_lat[i]) * cos_poi_lat * math.cos(dlon)
+            bearings[i] = (math.atan2(y, x) * RAD2DEG + 360) % 360
+        return distances, bearings
+else:
+    _distance_and_bearing = _distance_and_bearing_numpy
+
+# Builds a POI marker in the browser from a [lat, lon, name] row
+POI_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: "info-sign", prefix: "glyphicon", markerColor: "blue"});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    var popup = document.createElement("div");
+    popup.textContent = "POI: " + row[2];
+    marker.bindPopup(popup);
+    return marker;
+};
+"""
 
 class POIProcessor:
     def __init__(self, results):
         self.results = results
         self.segment_bearings = self._calculate_segment_bearings()
-        self.poi_groups = defaultdict(list)
-        self.seen_records = set()
-        self.data_to_write = []
+        self.poi_groups = pd.DataFrame()
+        self.data_to_write = pd.DataFrame()
 
     @staticmethod
     def calculate_bearing(lat1, lon1, lat2, lon2):
@@ -32,7 +128,6 @@ class POIProcessor:
           Calculate the distance and bearing between two coordinates.
         """
         # Convert to radians
-        EARTH_RADIUS = 6371 * 1000
         dlat = math.radians(lat2 - lat1)
         dlon = math.radians(lon2 - lon1)
         lat1 = math.radians(lat1)
@@ -62,73 +157,82 @@ class POIProcessor:
         """
         Calculate the average bearing for each segment of the route.
         """
-        segment_bearings = []
-        for i in range(len(self.results) - 1):
-            lat1, lon1 = self.results[i]['coordinate']["lat"], self.results[i]['coordinate']["lon"]
-            lat2, lon2 = self.results[i + 1]['coordinate']["lat"], self.results[i + 1]['coordinate']["lon"]
-            segment_bearing = self.calculate_bearing(lat1, lon1, lat2, lon2)
-            segment_bearings.append(segment_bearing)
-        return segment_bearings
+        lats = np.array([result['coordinate']["lat"] for result in self.results], dtype=float)
+        lons = np.array([result['coordinate']["lon"] for result in self.results], dtype=float)
+
+        lat1 = np.deg2rad(lats[:-1])
+        lat2 = np.deg2rad(lats[1:])
+        delta_lon = np.deg2rad(lons[1:] - lons[:-1])
+
+        x = np.sin(delta_lon) * np.cos(lat2)
+        y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lon)
+
+        return (np.degrees(np.arctan2(x, y)) + 360) % 360
 
     def process_pois(self):
         """
         Process Nearby Search data and calculate necessary information.
 
         """
-        for i, result in enumerate(self.results):
-            source_lat = result['coordinate']["lat"]
-            source_lon = result['coordinate']["lon"]
-            nearby_results = result["nearby"].get("result", [])
+        src_lat, src_lon, poi_lat, poi_lon, result_index, names, types = _flatten_results(self.results)
 
-            # Use the average bearing of the current segment
-            current_bearing = self.segment_bearings[i] if i < len(self.segment_bearings) else self.segment_bearings[-1]
+        # Use the average bearing of the current segment; the last point reuses the final segment
+        route_bearings = np.append(self.segment_bearings, self.segment_bearings[-1:])
+        seg_bearing = route_bearings[result_index]
 
-            for poi in nearby_results:
-                name = poi.get("name")
-                location = poi.get("location", {})
-                poi_lat = location.get("lat")
-                poi_lon = location.get("lng")
-                types = poi.get("types", [])
+        # Calculate distance and bearing for all POIs at once, converting to radians a single time
+        distances, bearings = _distance_and_bearing(
+            src_lat * DEG2RAD, src_lon * DEG2RAD, poi_lat * DEG2RAD, poi_lon * DEG2RAD
+        )
 
-                # Calculate distance and bearing
-                distance, poi_bearing = self.haversine_and_bearing(source_lat, source_lon, poi_lat, poi_lon)
+        # A POI is on the right when it lies within 180 degrees clockwise of the route
+        side_codes = ((bearings - seg_bearing) % 360 <= 180).astype(np.int8)
 
-                side = self.determine_side(poi_bearing, current_bearing)
+        pois = pd.DataFrame({
+            "source_lat": src_lat, "source_lon": src_lon,
+            "poi_name": pd.Series(names, dtype=object), "poi_lat": poi_lat, "poi_lon": poi_lon,
+            "distance": distances, "bearing": bearings,
+            "side_code": side_codes, "all_types": types,
+        })
 
-                record_key = (source_lat, source_lon, poi_lat, poi_lon, name)
-                if record_key in self.seen_records:
-                    continue
+        # Deduplicate on a packed key: bit-exact int64 views of the coordinates plus an integer name code
+        record_keys = pd.DataFrame(np.column_stack([src_lat, src_lon, poi_lat, poi_lon]).view(np.int64))
+        record_keys["poi_name"] = pd.factorize(pois["poi_name"])[0]
+        pois = pois[~record_keys.duplicated(keep="first").to_numpy()]
 
-                self.seen_records.add(record_key)
+        self.data_to_write = self._update_shared_details(pois)
 
-                self.data_to_write.append([
-                    source_lat, source_lon,
-                    name, poi_lat, poi_lon,
-                    distance, poi_bearing,
-                    side, ",".join(types),  
-                    None  
-                ])
-
-                # Update POI
-                self.poi_groups[name].append((side, source_lat, source_lon))
-
-        self._update_shared_details()
-
-    def _update_shared_details(self):
+    def _update_shared_details(self, pois):
         """
         Update shared POI group information.
         """
-        for row in self.data_to_write:
-            poi_name = row[2]
-            shared_sources = self.poi_groups[poi_name]
-            if len(shared_sources) > 1:
-                # Đếm số lần trái/phải
-                side_counts = {"Left": 0, "Right": 0}
-                for side, _, _ in shared_sources:
-                    side_counts[side] += 1
-                row[7] = "Right" if side_counts["Right"] > side_counts["Left"] else "Left"
-
-            row[-1] = "; ".join([f"{lat}, {lon}" for _, lat, lon in shared_sources])
+        # Majority side and shared sources are computed once per POI name, grouped on integer
+        # name codes so that missing names form their own group
+        name_codes, names = pd.factorize(pois["poi_name"], use_na_sentinel=False)
+        source_counts = np.bincount(name_codes, minlength=len(names))
+        right_counts = np.bincount(name_codes, weights=pois["side_code"].to_numpy(), minlength=len(names)).astype(int)
+        majority_codes = (right_counts > source_counts // 2).astype(np.int8)
+        shared_with = (
+            (pois["source_lat"].astype(str) + ", " + pois["source_lon"].astype(str))
+            .groupby(name_codes).agg("; ".join)
+            .reindex(range(len(names))).to_numpy()
+        )
+        self.poi_groups = pd.DataFrame({
+            "source_count": source_counts,
+            "right_count": right_counts,
+            "shared_with": shared_with,
+            "majority_side": SIDE_LABELS[majority_codes],
+        }, index=pd.Index(names, name="poi_name"))
+
+        side_codes = np.where(
+            source_counts[name_codes] <= 1, pois["side_code"].to_numpy(), majority_codes[name_codes]
+        ).astype(np.int8)
+        pois = pois.assign(
+            side_code=side_codes,
+            side=SIDE_LABELS[side_codes],
+            shared_with=shared_with[name_codes]
+        )
+        return pois
 
     def write_to_csv(self, output_path):
         """
@@ -141,10 +245,7 @@ class POIProcessor:
             "side", "all_types", "shared_with"
         ]
 
-        with open(output_path, mode="w", newline="", encoding="utf-8-sig") as file:
-            writer = csv.writer(file)
-            writer.writerow(header)
-            writer.writerows(self.data_to_write)
+        self.data_to_write.reindex(columns=header).to_csv(output_path, index=False, encoding="utf-8-sig", lineterminator="\r\n")
 class RoutePOIVisualizer:
     def __init__(self, csv_path):
         self.csv_path = csv_path
@@ -160,7 +261,7 @@ class RoutePOIVisualizer:
             raise ValueError(f"File CSV cần các cột sau: {required_columns}")
 
         route_points = data[['source_lat', 'source_lon']].drop_duplicates().values.tolist()
-        pois = data[['poi_name', 'optimal_lat', 'optimal_lon']].values.tolist()
+        pois = data[['optimal_lat', 'optimal_lon', 'poi_name']].values.tolist()
 
         map_center = route_points[0] if route_points else [0, 0]
         my_map = folium.Map(location=map_center, zoom_start=15)
@@ -174,14 +275,8 @@ class RoutePOIVisualizer:
             tooltip="Route"
         ).add_to(my_map)
 
-        # Add markers for POIs
-        for poi_name, optimal_lat, optimal_lon in pois:
-
-            folium.Marker(
-                location=[optimal_lat, optimal_lon],
-                popup=f"POI: {poi_name}",
-                icon=folium.Icon(icon="info-sign")
-            ).add_to(my_map)
+        # Add markers for POIs, passed to the browser as one array and clustered there
+        FastMarkerCluster(data=pois, callback=POI_MARKER_CALLBACK).add_to(my_map)
 
         my_map.save(output_html)
         print(f"Map has been saved to: {output_html}")